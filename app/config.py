@@ -2,32 +2,18 @@
 import os
 from pathlib import Path
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-# Load .env: cwd first, then project root with override so project .env wins over shell/cwd
+# Parse project .env once; its values win over shell env
 _env_path = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv()
-load_dotenv(_env_path, override=True)
+_ENV = dotenv_values(_env_path) if _env_path.exists() else {}
 
 
 def _str(key: str, default: str = "") -> str:
-    return os.environ.get(key, default).strip()
-
-
-def _angi_api_key_from_project_env() -> str:
-    """Read ANGI_API_KEY from project .env so it wins over shell env (e.g. 25-char key elsewhere)."""
-    if not _env_path.exists():
-        return ""
-    try:
-        text = _env_path.read_text()
-        for line in text.splitlines():
-            line = line.strip()
-            if line.startswith("ANGI_API_KEY=") and not line.startswith("ANGI_API_KEY=#"):
-                val = line.split("=", 1)[1].strip().strip('"').strip("'")
-                return val
-    except Exception:
-        pass
-    return ""
+    val = _ENV.get(key)
+    if val is None:
+        val = os.environ.get(key, default)
+    return val.strip()
 
 
 def _bool(key: str, default: bool = False) -> bool:
@@ -42,8 +28,8 @@ def _bool(key: str, default: bool = False) -> bool:
 # Database
 DATABASE_URL = _str("DATABASE_URL") or "sqlite:///./doorbell.db"
 
-# Angi webhook (prefer project .env over shell so project key always wins)
-ANGI_API_KEY = _angi_api_key_from_project_env() or _str("ANGI_API_KEY")
+# Angi webhook
+ANGI_API_KEY = _str("ANGI_API_KEY")
 
 
 # SendGrid (optional)
@@ -1,21 +1,50 @@
 """SQLAlchemy engine, session, and init_db for Knock Knock."""
-from sqlalchemy import create_engine
+import orjson
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.config import DATABASE_URL
 from app.models import Base
 
+_is_sqlite = DATABASE_URL.startswith("sqlite")
+
 # SQLite needs check_same_thread=False for FastAPI
 connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
+engine_kwargs = {}
+if _is_sqlite:
     connect_args["check_same_thread"] = False
+    # In-memory DB lives in a single connection; share it across the app
+    if DATABASE_URL in ("sqlite://", "sqlite:///:memory:"):
+        engine_kwargs["poolclass"] = StaticPool
 
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
     echo=False,
+    # JSON/JSONB columns (lead_events.meta) are encoded with orjson
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads,
+    **engine_kwargs,
+)
+# Sessions are short-lived and nothing is re-read after commit, so skip expiring
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+if _is_sqlite:
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _):
+        """WAL so readers don't block on webhook writes; mmap + larger cache for reads."""
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=268435456")
+        cur.execute("PRAGMA cache_size=-65536")
+        cur.close()
 
 
 def get_db():
@@ -29,4 +58,8 @@ def get_db():
 
 def init_db() -> None:
     """Create all tables. Call on startup."""
+    # One catalog query instead of a has_table check per model on warm starts
+    existing = set(inspect(engine).get_table_names())
+    if existing.issuperset(Base.metadata.tables):
+        return
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,21 @@
+"""In-process memory of recently ingested Angi correlation ids for Knock Knock."""
+import threading
+
+from cachetools import TTLCache
+
+# Ids are only added once their lead is known to be committed, so a hit is always a
+# real duplicate; a miss (evicted, expired, other worker) falls through to the DB.
+_seen: TTLCache = TTLCache(maxsize=65536, ttl=24 * 60 * 60)
+_lock = threading.Lock()
+
+
+def seen(correlation_id: str) -> bool:
+    """True if this process recently ingested (or saw a stored) lead with this id."""
+    with _lock:
+        return correlation_id in _seen
+
+
+def mark_seen(correlation_id: str) -> None:
+    """Remember a correlation_id whose lead is committed."""
+    with _lock:
+        _seen[correlation_id] = True
@@ -3,6 +3,27 @@ from typing import Optional
 
 from app.config import SENDGRID_API_KEY
 
+SENDGRID_BASE_URL = "https://api.sendgrid.com"
+# Seconds per SendGrid request (connect/read/write/pool)
+SENDGRID_TIMEOUT = 10.0
+
+# Created on first send; pooled so sends reuse a keep-alive TLS connection
+_sg_client = None
+
+
+def _get_sg():
+    """Return the process-wide SendGrid HTTP client."""
+    global _sg_client
+    if _sg_client is None:
+        import httpx
+
+        _sg_client = httpx.Client(
+            base_url=SENDGRID_BASE_URL,
+            headers={"Authorization": f"Bearer {SENDGRID_API_KEY}"},
+            timeout=SENDGRID_TIMEOUT,
+        )
+    return _sg_client
+
 
 def send_email(
     *,
@@ -40,17 +61,17 @@ def _send_via_sendgrid(
     body: str,
 ) -> tuple[bool, Optional[str], Optional[str]]:
     try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-
-        message = Mail(
-            from_email=from_address,
-            to_emails=to_address,
-            subject=subject,
-            plain_text_content=body,
+        response = _get_sg().post(
+            "/v3/mail/send",
+            json={
+                "personalizations": [{"to": [{"email": to_address}]}],
+                "from": {"email": from_address},
+                "subject": subject,
+                "content": [{"type": "text/plain", "value": body}],
+            },
         )
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
+        if response.is_error:
+            return False, None, f"SendGrid HTTP {response.status_code}: {response.text}"
         msg_id = response.headers.get("X-Message-Id") or str(response.status_code)
         return True, msg_id, None
     except Exception as e:
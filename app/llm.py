@@ -1,16 +1,151 @@
 """Optional OpenAI email drafting with template fallback for Knock Knock."""
+import re
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
 from typing import Optional
 
+from cachetools import LRUCache
+
 from app.config import OPENAI_API_KEY, USE_LLM_EMAIL
 
+# Created on first draft so the openai import and its HTTP pool are paid once
+_openai_client = None
+
+# Seconds; the SDK default (10 min) would tie up a webhook worker on a stalled call
+OPENAI_TIMEOUT = 10.0
+
+
+def _get_client():
+    """Return the process-wide OpenAI client, or None without OPENAI_API_KEY."""
+    global _openai_client
+    if _openai_client is None and OPENAI_API_KEY:
+        from openai import OpenAI
+
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT)
+    return _openai_client
+
+
+def _full_name(first: Optional[str], last: Optional[str]) -> str:
+    """Lead's display name for greetings; "there" when neither part is set."""
+    if first and last:
+        return f"{first} {last}"
+    return first or last or "there"
+
+
+# The LLM writes this token where the lead's name goes, so one draft can be
+# reused for every lead with the same tenant/category/location
+_NAME_TOKEN = "[[NAME]]"
+# Anything still looking like a placeholder once the token is removed ([[Name]],
+# [NAME], [Your Name], {name}, ...) means the draft is unusable as a real email
+_LEFTOVER_PLACEHOLDER = re.compile(r"\[\[|\]\]|\[[^\]\n]{1,40}\]|\{[^}\n]{1,40}\}")
+
+# Prompt = per-tenant head (rendered once per tenant) + per-lead tail
+_PROMPT_HEAD_TMPL = (
+    "Write a brief, professional outreach email (2-3 sentences) from {tenant} to a lead. "
+    "Refer to the lead by name only as {name_token} (exactly as written; it is replaced with their name). "
+    "Use no other placeholders; write a real short email body only, no subject line.\n"
+)
+# The free-text description is left out: it would make every draft unique, and
+# the template fallback doesn't quote it either
+_PROMPT_TAIL_TMPL = "Category: {category}\nLocation: {city} {state}"
+
+
+@lru_cache(maxsize=256)
+def _prompt_head(tenant_name: str) -> str:
+    """Tenant-specific prompt head; only the lead fields are formatted per call."""
+    return _PROMPT_HEAD_TMPL.format_map({"tenant": tenant_name, "name_token": _NAME_TOKEN})
+
+
+# (tenant_name, category, city, state) -> drafted body containing _NAME_TOKEN. A
+# tenant sees a handful of categories across a few cities, so the key repeats
+# across leads and most drafts after warm-up skip the OpenAI call
+_draft_cache: LRUCache = LRUCache(maxsize=2048)
+# Same key -> Future of the completion currently in flight, so concurrent leads
+# with one signature (e.g. a burst of plumbing leads for one tenant and city)
+# share a single OpenAI call
+_draft_inflight: dict[tuple, Future] = {}
+_draft_lock = threading.Lock()
+
+
+def _is_usable_draft(draft: str) -> bool:
+    """True if the draft has the name token and no other placeholder-like text."""
+    if _NAME_TOKEN not in draft:
+        return False
+    return _LEFTOVER_PLACEHOLDER.search(draft.replace(_NAME_TOKEN, "")) is None
+
+
+def _request_draft(
+    tenant_name: str,
+    category: Optional[str],
+    city: Optional[str],
+    state: Optional[str],
+) -> Optional[str]:
+    """Call OpenAI for a draft containing _NAME_TOKEN. None if the reply is empty or unusable."""
+    client = _get_client()
+    prompt = _prompt_head(tenant_name) + _PROMPT_TAIL_TMPL.format_map(
+        {
+            "category": category or "N/A",
+            "city": city or "",
+            "state": state or "",
+        }
+    )
+    resp = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=200,
+    )
+    if resp.choices and resp.choices[0].message and resp.choices[0].message.content:
+        draft = resp.choices[0].message.content.strip()
+        if _is_usable_draft(draft):
+            return draft
+    return None
+
+
+def _draft_body_template(
+    tenant_name: str,
+    category: Optional[str],
+    city: Optional[str],
+    state: Optional[str],
+) -> Optional[str]:
+    """LLM draft with _NAME_TOKEN for the name; cached and coalesced per lead signature."""
+    key = (tenant_name, category, city, state)
+    with _draft_lock:
+        cached = _draft_cache.get(key)
+        if cached is not None:
+            return cached
+        fut = _draft_inflight.get(key)
+        owner = fut is None
+        if owner:
+            fut = _draft_inflight[key] = Future()
+    if not owner:
+        # Wait no longer than one OpenAI call; on timeout the lead gets the template
+        try:
+            return fut.result(timeout=OPENAI_TIMEOUT)
+        except FutureTimeoutError:
+            return None
+
+    try:
+        draft = _request_draft(tenant_name, category, city, state)
+    except BaseException as e:
+        with _draft_lock:
+            _draft_inflight.pop(key, None)
+        fut.set_exception(e)
+        raise
+    with _draft_lock:
+        if draft:
+            _draft_cache[key] = draft
+        _draft_inflight.pop(key, None)
+    fut.set_result(draft)
+    return draft
+
 
 def draft_email_with_llm(
     *,
     tenant_name: str,
-    first_name: Optional[str],
-    last_name: Optional[str],
+    name: str,
     category: Optional[str],
-    description: Optional[str],
     city: Optional[str],
     state: Optional[str],
 ) -> Optional[str]:
@@ -22,22 +157,9 @@ def draft_email_with_llm(
         return None
 
     try:
-        from openai import OpenAI
-
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        name = " ".join(filter(None, [first_name, last_name])) or "there"
-        prompt = f"""Write a brief, professional outreach email (2-3 sentences) from {tenant_name} to a lead named {name}.
-Category: {category or 'N/A'}
-Description: {description or 'N/A'}
-Location: {city or ''} {state or ''}. Do not use placeholders; write a real short email body only, no subject line."""
-
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=200,
-        )
-        if resp.choices and resp.choices[0].message and resp.choices[0].message.content:
-            return resp.choices[0].message.content.strip()
+        draft = _draft_body_template(tenant_name, category, city, state)
+        if draft:
+            return draft.replace(_NAME_TOKEN, name)
     except Exception:
         pass
     return None
@@ -56,26 +178,24 @@ def get_email_subject_and_body(
     """
     Return (subject, body). Uses LLM if available; otherwise deterministic template.
     """
+    name = _full_name(first_name, last_name)
     body_llm = draft_email_with_llm(
         tenant_name=tenant_name,
-        first_name=first_name,
-        last_name=last_name,
+        name=name,
         category=category,
-        description=description,
         city=city,
         state=state,
     )
-    name = " ".join(filter(None, [first_name, last_name])) or "there"
     if body_llm:
         subject = f"Hi {name} – {tenant_name} following up"
         return subject, body_llm
     # Template fallback
     subject = f"Quick follow-up from {tenant_name}"
-    body = f"Hi {name},\n\nThanks for your interest. We received your request"
+    parts = [f"Hi {name},\n\nThanks for your interest. We received your request"]
     if category:
-        body += f" for {category}"
-    body += " and would like to help."
+        parts.append(f" for {category}")
+    parts.append(" and would like to help.")
     if description:
-        body += f"\n\nWe'll review your details and get back to you soon."
-    body += "\n\nBest,\n" + tenant_name
-    return subject, body
+        parts.append("\n\nWe'll review your details and get back to you soon.")
+    parts.append(f"\n\nBest,\n{tenant_name}")
+    return subject, "".join(parts)
@@ -1,27 +1,60 @@
 """FastAPI app and routes for Knock Knock."""
-import json
+import hmac
+import logging
 from contextlib import asynccontextmanager
+from typing import Any
 
 from fastapi import FastAPI, Depends, Header, HTTPException, Request
-from fastapi.responses import PlainTextResponse, HTMLResponse
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, HTMLResponse, JSONResponse, Response
+import orjson
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
 
 from app.config import ANGI_API_KEY
-from app.db import init_db, get_db, SessionLocal
+from app.db import init_db, SessionLocal
 from app.schemas import AngiLeadWebhookPayload
-from app.services import process_angi_lead
+from app.services import OutreachJob, process_angi_lead, send_outreach
 from app.seed import seed_demo_data
 
+logger = logging.getLogger(__name__)
+
+# Pre-encoded once so each webhook only encodes the supplied key
+_ANGI_KEY_BYTES = ANGI_API_KEY.encode("utf-8") if ANGI_API_KEY else b""
+
+# Angi expects this exact body for every accepted webhook. The prebuilt response is
+# shared, so it must never carry a background task (Starlette would rerun it)
+_OK_BODY = b"<success>ok</success>"
+_OK_RESPONSE = Response(content=_OK_BODY, media_type="text/plain", status_code=200)
+_HEALTH_RESPONSE = Response(content=b'{"ok":true}', media_type="application/json")
+
+# Angi lead payloads are a few KB; reject anything far beyond that
+MAX_WEBHOOK_BODY_BYTES = 64 * 1024
+
+
+class _ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (fastapi.responses.ORJSONResponse is deprecated)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Set once startup work has run in this process (e.g. tests re-entering lifespan)
+_initialized = False
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Create tables and seed demo data on startup."""
-    init_db()
-    db = SessionLocal()
-    try:
-        seed_demo_data(db)
-    finally:
-        db.close()
+    global _initialized
+    if not _initialized:
+        init_db()
+        db = SessionLocal()
+        try:
+            seed_demo_data(db)
+        finally:
+            db.close()
+        _initialized = True
     yield
     # shutdown: nothing to do
 
@@ -30,6 +63,7 @@ app = FastAPI(
     title="Knock Knock",
     description="Ingest Angi leads via webhook, map to tenant, send outreach email.",
     version="0.1.0",
+    default_response_class=_ORJSONResponse,
     lifespan=lifespan,
 )
 
@@ -40,41 +74,35 @@ async def verify_angi_api_key(
 ) -> None:
     """Require X-API-KEY header (or api_key query param) to match ANGI_API_KEY."""
     # Header first; fallback to query param (some proxies e.g. ngrok strip custom headers)
-    key_from_header = (x_api_key.strip() if x_api_key else None) or None
-    key_from_query = request.query_params.get("api_key")
-    supplied_key = key_from_header or (key_from_query.strip() if key_from_query else None) or None
-    if not ANGI_API_KEY or supplied_key != ANGI_API_KEY:
+    supplied_key = (x_api_key or "").strip() or (request.query_params.get("api_key") or "").strip()
+    if not _ANGI_KEY_BYTES or not hmac.compare_digest(supplied_key.encode("utf-8"), _ANGI_KEY_BYTES):
         raise HTTPException(status_code=401, detail="Invalid or missing API key")
 
 
-@app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
-    """Landing page for interviewers: instructions + copy-paste curl with correct base URL."""
-    base = str(request.base_url).rstrip("/")
-    curl_url = f"{base}/webhooks/angi/leads"
-    html = f"""<!DOCTYPE html>
+# Landing page; {BASE} is replaced with the request's base URL
+_HTML_TMPL = """<!DOCTYPE html>
 <html>
 <head>
   <meta charset="utf-8">
   <title>Knock Knock – Angi webhook</title>
   <style>
-    body {{ font-family: system-ui, sans-serif; max-width: 720px; margin: 2rem auto; padding: 0 1rem; }}
-    h1 {{ font-size: 1.5rem; }}
-    p {{ color: #444; line-height: 1.5; }}
-    pre {{ background: #f5f5f5; padding: 1rem; overflow-x: auto; border-radius: 6px; font-size: 0.85rem; }}
-    code {{ font-family: ui-monospace, monospace; }}
-    .note {{ background: #f0f7ff; padding: 0.75rem 1rem; border-radius: 6px; margin: 1rem 0; }}
-    a {{ color: #0066cc; }}
+    body { font-family: system-ui, sans-serif; max-width: 720px; margin: 2rem auto; padding: 0 1rem; }
+    h1 { font-size: 1.5rem; }
+    p { color: #444; line-height: 1.5; }
+    pre { background: #f5f5f5; padding: 1rem; overflow-x: auto; border-radius: 6px; font-size: 0.85rem; }
+    code { font-family: ui-monospace, monospace; }
+    .note { background: #f0f7ff; padding: 0.75rem 1rem; border-radius: 6px; margin: 1rem 0; }
+    a { color: #0066cc; }
   </style>
 </head>
 <body>
   <h1>Knock Knock – Angi lead webhook</h1>
   <p>To simulate an Angi API call, send a POST request to the webhook endpoint. Use the curl command below (replace <code>YOUR_API_KEY</code> with the API key provided by the host).</p>
   <div class="note"><strong>Run this in your terminal:</strong></div>
-  <pre id="curl">curl -X POST {curl_url} \\
+  <pre id="curl">curl -X POST {BASE}/webhooks/angi/leads \\
   -H "Content-Type: application/json" \\
   -H "X-API-KEY: YOUR_API_KEY" \\
-  -d '{{
+  -d '{
     "CorrelationId": "lead-001",
     "ALAccountId": "123456",
     "Email": "customer@example.com",
@@ -84,25 +112,73 @@ async def root(request: Request):
     "Description": "Need plumbing repair",
     "Category": "Plumbing",
     "Urgency": "high",
-    "PostalAddress": {{
+    "PostalAddress": {
       "AddressFirstLine": "123 Main St",
       "City": "Boston",
       "State": "MA",
       "PostalCode": "02101"
-    }}
-  }}'</pre>
+    }
+  }'</pre>
   <p><button onclick="navigator.clipboard.writeText(document.getElementById('curl').innerText)">Copy curl</button></p>
-  <p>Alternatively, put the key in the URL: <code>{base}/webhooks/angi/leads?api_key=YOUR_API_KEY</code> (same POST body).</p>
+  <p>Alternatively, put the key in the URL: <code>{BASE}/webhooks/angi/leads?api_key=YOUR_API_KEY</code> (same POST body).</p>
   <p><a href="/docs">Open API docs (Swagger)</a> · <a href="/healthz">Health check</a></p>
 </body>
 </html>"""
+# Keyed by base URL; bounded since the Host header is client-controlled
+_HTML_CACHE: dict[str, str] = {}
+_HTML_CACHE_MAX = 16
+
+
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    """Landing page for interviewers: instructions + copy-paste curl with correct base URL."""
+    base = str(request.base_url).rstrip("/")
+    html = _HTML_CACHE.get(base)
+    if html is None:
+        html = _HTML_TMPL.replace("{BASE}", base)
+        if len(_HTML_CACHE) < _HTML_CACHE_MAX:
+            _HTML_CACHE[base] = html
     return HTMLResponse(html)
 
 
 @app.get("/healthz")
 def healthz():
     """Health check."""
-    return {"ok": True}
+    return _HEALTH_RESPONSE
+
+
+async def _read_body_capped(request: Request, limit: int = MAX_WEBHOOK_BODY_BYTES) -> bytes:
+    """Read the request body, raising 413 as soon as it exceeds limit bytes."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Request body too large")
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail="Request body too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _process_lead(payload: AngiLeadWebhookPayload, raw_json: bytes) -> OutreachJob | None:
+    """
+    Run process_angi_lead in its own session. Called from the threadpool so the
+    session lives on the same worker thread as the work, rather than going
+    through a sync get_db dependency (one threadpool hop to open, one to close).
+    """
+    with SessionLocal() as db:
+        return process_angi_lead(db, payload, raw_json)
+
+
+def _send_outreach(job: OutreachJob) -> None:
+    """Background task: draft and send the email after the webhook has responded."""
+    try:
+        with SessionLocal() as db:
+            send_outreach(db, job)
+    except Exception:
+        logger.exception("outreach failed for lead %s", job.lead_id)
 
 
 @app.post(
@@ -113,27 +189,32 @@ def healthz():
 async def webhook_angi_leads(
     request: Request,
     _: None = Depends(verify_angi_api_key),
-    db: Session = Depends(get_db),
 ):
     """
     Ingest Angi lead webhook: verify key, parse payload, dedupe by correlation_id,
-    map tenant, persist lead, send email, return success.
+    map tenant, persist lead, return success; the email is sent after responding.
     """
-    body_bytes = await request.body()
-    raw_json = body_bytes.decode("utf-8") if body_bytes else ""
+    body_bytes = await _read_body_capped(request)
 
+    # Parse and validate straight from bytes; no intermediate dict
     try:
-        payload_dict = json.loads(raw_json) if raw_json else {}
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
-
-    payload = AngiLeadWebhookPayload.model_validate(payload_dict)
-
-    is_duplicate, err_msg = process_angi_lead(db, payload, raw_json)
-
-    if is_duplicate:
-        return PlainTextResponse("<success>ok</success>", status_code=200)
-    if err_msg:
-        # Still return 200 per spec; log the failure
-        return PlainTextResponse("<success>ok</success>", status_code=200)
-    return PlainTextResponse("<success>ok</success>", status_code=200)
+        payload = AngiLeadWebhookPayload.model_validate_json(body_bytes or b"{}")
+    except ValidationError as e:
+        if any(err["type"] == "json_invalid" for err in e.errors()):
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        raise HTTPException(status_code=400, detail="Invalid payload")
+
+    # DB writes are blocking; keep them off the event loop. The body is stored
+    # as received (bytes), so it is never decoded/re-encoded
+    job = await run_in_threadpool(_process_lead, payload, body_bytes)
+    if job is None:
+        # Duplicate: already sent (or being sent) for this correlation_id
+        return _OK_RESPONSE
+
+    # Drafting (LLM) and SendGrid take 100s of ms to seconds; run them after the
+    # 200 is sent. Send failures are recorded by send_outreach, not returned.
+    return Response(
+        content=_OK_BODY,
+        media_type="text/plain",
+        background=BackgroundTask(_send_outreach, job),
+    )
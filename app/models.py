@@ -1,15 +1,17 @@
 """SQLAlchemy ORM models for Knock Knock."""
-import json
+import threading
 import uuid
 from datetime import datetime
-from typing import Any, Optional
+from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, String, Text
+import zstandard
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Index, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
 def _uuid_str() -> str:
-    return str(uuid.uuid4())
+    return uuid.uuid4().hex
 
 
 class Base(DeclarativeBase):
@@ -19,7 +21,7 @@ class Base(DeclarativeBase):
 class Tenant(Base):
     __tablename__ = "tenants"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=_uuid_str)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     from_email: Mapped[str] = mapped_column(String(255), nullable=False)
     timezone: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
@@ -34,25 +36,39 @@ class Tenant(Base):
 class AngiMapping(Base):
     __tablename__ = "angi_mappings"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
-    al_account_id: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=_uuid_str)
+    # At most one *active* mapping per account; see angi_mappings_active_account_idx
+    al_account_id: Mapped[str] = mapped_column(String(255), nullable=False)
     tenant_id: Mapped[str] = mapped_column(
-        String(36), ForeignKey("tenants.id"), nullable=False
+        String(32), ForeignKey("tenants.id"), nullable=False
     )
     active: Mapped[bool] = mapped_column(Boolean, default=True)
 
     tenant = relationship("Tenant", back_populates="angi_mappings")
 
 
+# Partial unique index: only active rows are indexed, so it stays small, enforces one
+# active mapping per account, and matches the tenant lookup's `active` predicate
+Index(
+    "angi_mappings_active_account_idx",
+    AngiMapping.al_account_id,
+    unique=True,
+    sqlite_where=AngiMapping.active == True,
+    postgresql_where=AngiMapping.active == True,
+)
+
+
 class Lead(Base):
     __tablename__ = "leads"
+    __table_args__ = (Index("ix_leads_tenant_received", "tenant_id", "received_at"),)
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=_uuid_str)
     source: Mapped[str] = mapped_column(String(64), nullable=False, default="angi")
     correlation_id: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
     al_account_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Indexed via ix_leads_tenant_received (tenant_id is its leading column)
     tenant_id: Mapped[str] = mapped_column(
-        String(36), ForeignKey("tenants.id"), nullable=False
+        String(32), ForeignKey("tenants.id"), nullable=False
     )
     first_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     last_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -64,30 +80,40 @@ class Lead(Base):
     city: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     state: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     postal_code: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
-    raw_payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    received_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # zstd-compressed webhook body; see compress_payload / raw_payload_text
+    raw_payload: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
 
     tenant = relationship("Tenant", back_populates="leads")
     outreach_messages = relationship("OutreachMessage", back_populates="lead")
     lead_events = relationship("LeadEvent", back_populates="lead")
 
+    @property
+    def raw_payload_text(self) -> Optional[str]:
+        """Decompressed webhook body as received."""
+        if self.raw_payload is None:
+            return None
+        return zstandard.ZstdDecompressor().decompress(self.raw_payload).decode("utf-8")
+
 
 class OutreachMessage(Base):
     __tablename__ = "outreach_messages"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=_uuid_str)
     lead_id: Mapped[str] = mapped_column(
-        String(36), ForeignKey("leads.id"), nullable=False
+        String(32), ForeignKey("leads.id"), nullable=False, index=True
     )
     tenant_id: Mapped[str] = mapped_column(
-        String(36), ForeignKey("tenants.id"), nullable=False
+        String(32), ForeignKey("tenants.id"), nullable=False, index=True
     )
     channel: Mapped[str] = mapped_column(String(32), nullable=False, default="email")
     to_address: Mapped[str] = mapped_column(String(255), nullable=False)
     from_address: Mapped[str] = mapped_column(String(255), nullable=False)
     subject: Mapped[str] = mapped_column(String(512), nullable=False)
     body: Mapped[str] = mapped_column(Text, nullable=False)
-    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
     provider_message_id: Mapped[Optional[str]] = mapped_column(
         String(255), nullable=True
     )
@@ -101,23 +127,34 @@ class OutreachMessage(Base):
 class LeadEvent(Base):
     __tablename__ = "lead_events"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=_uuid_str)
     lead_id: Mapped[str] = mapped_column(
-        String(36), ForeignKey("leads.id"), nullable=False
+        String(32), ForeignKey("leads.id"), nullable=False, index=True
     )
     tenant_id: Mapped[str] = mapped_column(
-        String(36), ForeignKey("tenants.id"), nullable=False
+        String(32), ForeignKey("tenants.id"), nullable=False, index=True
     )
     event_type: Mapped[str] = mapped_column(String(64), nullable=False)
-    event_ts: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    meta: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    event_ts: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
+    # JSONB on Postgres so meta can be queried/indexed; generic JSON elsewhere
+    meta: Mapped[Optional[dict]] = mapped_column(
+        JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"),
+        nullable=True,
+    )
 
     lead = relationship("Lead", back_populates="lead_events")
     tenant = relationship("Tenant", back_populates="lead_events")
 
 
-def meta_to_str(data: Any) -> str:
-    """Serialize meta dict to TEXT for storage."""
-    if data is None:
-        return ""
-    return json.dumps(data) if isinstance(data, dict) else str(data)
+# ZstdCompressor instances are not thread-safe; keep one per worker thread
+_zstd_local = threading.local()
+
+
+def compress_payload(raw: bytes) -> bytes:
+    """Compress a webhook body (raw request bytes) for Lead.raw_payload."""
+    cctx = getattr(_zstd_local, "cctx", None)
+    if cctx is None:
+        cctx = _zstd_local.cctx = zstandard.ZstdCompressor(level=3)
+    return cctx.compress(raw)
@@ -1,47 +1,46 @@
 """Seed demo data for Knock Knock (tenants + angi_mappings)."""
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
-from app.models import AngiMapping, Tenant
+from app.models import AngiMapping, Tenant, _uuid_str
 
 
 def seed_demo_data(db: Session) -> None:
     """Create default tenants and angi_mappings if tables are empty."""
-    if db.query(Tenant).first() is not None:
+    if db.scalar(select(select(Tenant.id).exists())):
         return
 
-    t_default = Tenant(
-        id="tenant_default",
-        name="tenant_default",
-        from_email="noreply@knockknock.example.com",
-        timezone="America/New_York",
+    # Ids generated up front so mappings can reference tenants without a flush
+    bob_id = _uuid_str()
+    alice_id = _uuid_str()
+    db.execute(
+        insert(Tenant),
+        [
+            {
+                "id": "tenant_default",
+                "name": "tenant_default",
+                "from_email": "noreply@knockknock.example.com",
+                "timezone": "America/New_York",
+            },
+            {
+                "id": bob_id,
+                "name": "tenant_bob_plumbing",
+                "from_email": "bob@example.com",
+                "timezone": "America/New_York",
+            },
+            {
+                "id": alice_id,
+                "name": "tenant_alice_hvac",
+                "from_email": "alice@example.com",
+                "timezone": "America/New_York",
+            },
+        ],
     )
-    t_bob = Tenant(
-        name="tenant_bob_plumbing",
-        from_email="bob@example.com",
-        timezone="America/New_York",
-    )
-    t_alice = Tenant(
-        name="tenant_alice_hvac",
-        from_email="alice@example.com",
-        timezone="America/New_York",
-    )
-    db.add(t_default)
-    db.add(t_bob)
-    db.add(t_alice)
-    db.flush()
-
-    db.add(
-        AngiMapping(
-            al_account_id="123456",
-            tenant_id=t_bob.id,
-            active=True,
-        )
-    )
-    db.add(
-        AngiMapping(
-            al_account_id="999999",
-            tenant_id=t_alice.id,
-            active=True,
-        )
+    db.execute(
+        insert(AngiMapping),
+        [
+            {"al_account_id": "123456", "tenant_id": bob_id, "active": True},
+            {"al_account_id": "999999", "tenant_id": alice_id, "active": True},
+        ],
     )
     db.commit()
@@ -2,11 +2,15 @@
 import json
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple, Optional
 
+from sqlalchemy import bindparam, insert, literal, literal_column, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app import dedupe, tenant_cache
 from app.emailer import send_email
 from app.llm import get_email_subject_and_body
 from app.models import (
@@ -15,58 +19,147 @@ from app.models import (
     OutreachMessage,
     Tenant,
     AngiMapping,
-    meta_to_str,
+    _uuid_str,
+    compress_payload,
 )
 from app.schemas import AngiLeadWebhookPayload
+from app.tenant_cache import CachedTenant
 
 logger = logging.getLogger(__name__)
 
 
-def _find_tenant_for_al_account(db: Session, al_account_id: Optional[str]) -> Tenant:
-    """Resolve tenant by ALAccountId; if missing, return tenant_default."""
-    if al_account_id:
-        mapping = (
-            db.query(AngiMapping)
-            .filter(
-                AngiMapping.al_account_id == al_account_id,
-                AngiMapping.active == True,
-            )
-            .first()
-        )
-        if mapping:
-            return db.query(Tenant).filter(Tenant.id == mapping.tenant_id).first()
-    default = db.query(Tenant).filter(Tenant.id == "tenant_default").first()
-    if default:
-        return default
-    raise RuntimeError("tenant_default not found; run seed_demo_data first")
+class OutreachJob(NamedTuple):
+    """Everything needed to draft and send a new lead's outreach email outside the request."""
 
+    lead_id: str
+    tenant: CachedTenant
+    to_address: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    category: Optional[str]
+    description: Optional[str]
+    city: Optional[str]
+    state: Optional[str]
 
-def _lead_from_payload(
-    db: Session,
+
+# Dialects that support INSERT ... ON CONFLICT DO NOTHING ... RETURNING
+_ON_CONFLICT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+# Driver error codes for a unique-constraint violation
+_UNIQUE_VIOLATION_SQLSTATE = "23505"  # Postgres: psycopg2 pgcode / psycopg sqlstate
+_SQLITE_CONSTRAINT_UNIQUE = 2067  # sqlite3 sqlite_errorcode
+_UNIQUE_VIOLATION_ERRNOS = frozenset({1062, 2601, 2627})  # MySQL/MariaDB; SQL Server
+
+# Existence probe on the unique correlation_id index; no Lead row is fetched
+_LEAD_EXISTS = (
+    select(literal(1))
+    .where(Lead.correlation_id == bindparam("correlation_id"))
+    .limit(1)
+)
+
+# Mapped tenant (rank 0) or tenant_default (rank 1) in one round trip; each
+# branch is an indexed lookup
+_TENANT_LOOKUP = (
+    union_all(
+        select(Tenant.id, Tenant.name, Tenant.from_email, literal_column("0").label("match_rank"))
+        .join(AngiMapping, AngiMapping.tenant_id == Tenant.id)
+        .where(
+            AngiMapping.al_account_id == bindparam("al_account_id"),
+            AngiMapping.active == True,
+        ),
+        select(Tenant.id, Tenant.name, Tenant.from_email, literal_column("1").label("match_rank"))
+        .where(Tenant.id == "tenant_default"),
+    )
+    .order_by(literal_column("match_rank"))
+    .limit(1)
+)
+
+# Built once; executed with the queued event dicts as a single executemany
+_LEAD_EVENT_INSERT = insert(LeadEvent)
+
+
+def _find_tenant_for_al_account(
+    db: Session, al_account_id: Optional[str]
+) -> CachedTenant:
+    """Resolve tenant by ALAccountId; if missing, return tenant_default. Cached per ALAccountId."""
+    key = al_account_id or None
+    cached = tenant_cache.get(key)
+    if cached is not None:
+        return cached
+
+    row = db.execute(_TENANT_LOOKUP, {"al_account_id": key}).first()
+    if row is None:
+        raise RuntimeError("tenant_default not found; run seed_demo_data first")
+
+    tenant = CachedTenant(row.id, row.name, row.from_email)
+    tenant_cache.put(key, tenant)
+    return tenant
+
+
+def _lead_values_from_payload(
     payload: AngiLeadWebhookPayload,
-    tenant: Tenant,
-    raw_json: str,
-) -> Lead:
-    """Build Lead model from webhook payload."""
+    tenant: CachedTenant,
+    raw_json: bytes,
+    now: Optional[datetime] = None,
+) -> dict:
+    """Build leads row values from webhook payload."""
     addr = payload.PostalAddress
-    return Lead(
-        source="angi",
-        correlation_id=payload.CorrelationId,
-        al_account_id=payload.ALAccountId,
-        tenant_id=tenant.id,
-        first_name=payload.FirstName,
-        last_name=payload.LastName,
-        email=payload.Email,
-        phone=payload.PhoneNumber,
-        category=payload.Category,
-        urgency=payload.Urgency,
-        description=payload.Description,
-        city=addr.City if addr else None,
-        state=addr.State if addr else None,
-        postal_code=addr.PostalCode if addr else None,
-        raw_payload=raw_json,
-        received_at=datetime.utcnow(),
-    )
+    return {
+        "source": "angi",
+        "correlation_id": payload.CorrelationId,
+        "al_account_id": payload.ALAccountId,
+        "tenant_id": tenant.id,
+        "first_name": payload.FirstName,
+        "last_name": payload.LastName,
+        "email": payload.Email,
+        "phone": payload.PhoneNumber,
+        "category": payload.Category,
+        "urgency": payload.Urgency,
+        "description": payload.Description,
+        "city": addr.City if addr else None,
+        "state": addr.State if addr else None,
+        "postal_code": addr.PostalCode if addr else None,
+        "raw_payload": compress_payload(raw_json),
+        "received_at": now or datetime.utcnow(),
+    }
+
+
+def _is_unique_violation(e: IntegrityError) -> bool:
+    """True if the driver reports a unique-constraint violation."""
+    orig = e.orig
+    if _UNIQUE_VIOLATION_SQLSTATE in (getattr(orig, "pgcode", None), getattr(orig, "sqlstate", None)):
+        return True
+    if getattr(orig, "sqlite_errorcode", None) == _SQLITE_CONSTRAINT_UNIQUE:
+        return True
+    args = getattr(orig, "args", ())
+    return bool(args) and args[0] in _UNIQUE_VIOLATION_ERRNOS
+
+
+def _insert_lead(db: Session, values: dict) -> Optional[str]:
+    """
+    Insert a lead unless its correlation_id already exists.
+
+    Returns the new lead id, or None if the lead is a duplicate.
+    """
+    dialect_insert = _ON_CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = (
+            dialect_insert(Lead)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[Lead.correlation_id])
+            .returning(Lead.id)
+        )
+        return db.execute(stmt).scalar()
+
+    # Other dialects: plain INSERT, unique constraint violation means duplicate
+    lead_id = _uuid_str()
+    try:
+        db.execute(insert(Lead).values(id=lead_id, **values))
+    except IntegrityError as e:
+        if _is_unique_violation(e):
+            return None
+        raise
+    return lead_id
 
 
 def _record_event(
@@ -76,119 +169,166 @@ def _record_event(
     event_type: str,
     meta: Optional[dict] = None,
 ) -> None:
-    ev = LeadEvent(
-        lead_id=lead_id,
-        tenant_id=tenant_id,
-        event_type=event_type,
-        event_ts=datetime.utcnow(),
-        meta=meta_to_str(meta),
+    """Queue a lead event on the session; written by _flush_events."""
+    db.info.setdefault("pending_events", []).append(
+        {
+            "lead_id": lead_id,
+            "tenant_id": tenant_id,
+            "event_type": event_type,
+            "event_ts": datetime.utcnow(),
+            "meta": meta,
+        }
     )
-    db.add(ev)
+
+
+def _flush_events(db: Session) -> None:
+    """Write queued lead events in one executemany INSERT. Call before commit."""
+    events = db.info.get("pending_events")
+    if events:
+        db.execute(_LEAD_EVENT_INSERT, events)
+        events.clear()
 
 
 def process_angi_lead(
     db: Session,
     payload: AngiLeadWebhookPayload,
-    raw_json: str,
-) -> tuple[bool, Optional[str]]:
+    raw_json: bytes,
+) -> Optional[OutreachJob]:
     """
-    Idempotent processing: dedupe by correlation_id, map tenant, persist lead,
-    compose and send email, record events.
+    Idempotent ingest: dedupe by correlation_id, map tenant, persist lead and
+    events. Drafting and sending the email is left to send_outreach so it can
+    run after the webhook has responded.
 
     Returns:
-        (is_duplicate, error_message)
-        - If duplicate: True, None (caller returns 200 without sending again).
-        - If error: False, error_message.
-        - If success: False, None.
+        The OutreachJob for a new lead, or None if the lead is a duplicate
+        (caller returns 200 without sending again).
     """
-    # 1) Dedupe: if lead with this correlation_id exists, treat as success (idempotent)
-    existing = (
-        db.query(Lead).filter(Lead.correlation_id == payload.CorrelationId).first()
-    )
-    if existing:
-        return True, None
+    # For leads.received_at only; each event takes its own event_ts so a lead's
+    # timeline stays ordered (lead_events.id is random)
+    now = datetime.utcnow()
+
+    # 1) Dedupe: if lead with this correlation_id exists, treat as success (idempotent).
+    #    Recent ids are answered from memory; otherwise a read-only probe, so
+    #    Angi retries never take the write lock.
+    correlation_id = payload.CorrelationId
+    if dedupe.seen(correlation_id):
+        return None
+    if db.execute(_LEAD_EXISTS, {"correlation_id": correlation_id}).first():
+        dedupe.mark_seen(correlation_id)
+        return None
 
     # 2) Tenant mapping
     tenant = _find_tenant_for_al_account(db, payload.ALAccountId)
     used_default_tenant = tenant.id == "tenant_default"
+
+    # 3) Persist lead; the INSERT ignores a correlation_id conflict, which
+    #    catches a concurrent duplicate that raced past step 1
+    values = _lead_values_from_payload(payload, tenant, raw_json, now)
+    lead_id = _insert_lead(db, values)
+    if lead_id is None:
+        dedupe.mark_seen(correlation_id)
+        return None
+
+    # Log fallback only for new leads
     if used_default_tenant:
         logger.info(
             "angi_mapping missing for ALAccountId=%s; using tenant_default",
             payload.ALAccountId,
         )
 
-    # 3) Persist lead
-    try:
-        lead = _lead_from_payload(db, payload, tenant, raw_json)
-        db.add(lead)
-        db.flush()
-    except IntegrityError as e:
-        if "correlation_id" in str(e).lower() or "unique" in str(e).lower():
-            return True, None
-        raise
-
-    # 4) Events: received, mapped; if used default tenant, log mapped_to_default
-    _record_event(db, lead.id, tenant.id, "received")
-    _record_event(db, lead.id, tenant.id, "mapped")
+    # 4) Events: received, mapped; if used default tenant, log mapped_to_default;
+    #    email_queued since the caller schedules send_outreach next
+    _record_event(db, lead_id, tenant.id, "received")
+    _record_event(db, lead_id, tenant.id, "mapped")
     if used_default_tenant:
         _record_event(
             db,
-            lead.id,
+            lead_id,
             tenant.id,
             "mapped_to_default",
             meta={"al_account_id": payload.ALAccountId},
         )
+    _record_event(db, lead_id, tenant.id, "email_queued")
+    _flush_events(db)
     db.commit()
+    dedupe.mark_seen(correlation_id)
 
-    # 5) Compose email (LLM or template)
+    return OutreachJob(
+        lead_id=lead_id,
+        tenant=tenant,
+        to_address=values["email"] or "unknown@example.com",
+        first_name=values["first_name"],
+        last_name=values["last_name"],
+        category=values["category"],
+        description=values["description"],
+        city=values["city"],
+        state=values["state"],
+    )
+
+
+def send_outreach(db: Session, job: OutreachJob) -> tuple[bool, Optional[str]]:
+    """
+    Compose (LLM or template) and send the outreach email for a new lead, then
+    persist the outreach_messages row and email_sent/email_failed event.
+
+    Returns:
+        (success, error_message)
+    """
+    tenant = job.tenant
+
+    # 1) Compose email (LLM or template)
     subject, body = get_email_subject_and_body(
         tenant_name=tenant.name,
-        first_name=lead.first_name,
-        last_name=lead.last_name,
-        category=lead.category,
-        description=lead.description,
-        city=lead.city,
-        state=lead.state,
+        first_name=job.first_name,
+        last_name=job.last_name,
+        category=job.category,
+        description=job.description,
+        city=job.city,
+        state=job.state,
     )
-    to_address = lead.email or "unknown@example.com"
     from_address = tenant.from_email
 
-    # 6) Record email_queued
-    _record_event(db, lead.id, tenant.id, "email_queued")
-
-    # 7) Send email
-    ok, provider_message_id, err_msg = send_email(
-        to_address=to_address,
-        from_address=from_address,
-        subject=subject,
-        body=body,
-    )
+    # 2) Send email; an unexpected exception is recorded as a failed send
+    try:
+        ok, provider_message_id, err_msg = send_email(
+            to_address=job.to_address,
+            from_address=from_address,
+            subject=subject,
+            body=body,
+        )
+    except Exception as e:
+        logger.exception("send_email raised for lead %s", job.lead_id)
+        ok, provider_message_id, err_msg = False, None, str(e)
 
-    # 8) Persist outreach_messages row (status: sent, mock_sent, or failed)
+    # 3) Persist outreach_messages row (status: sent, mock_sent, or failed)
+    now = datetime.utcnow()
     if ok:
         status = "mock_sent" if provider_message_id == "mock_sent" else "sent"
     else:
         status = "failed"
-    msg = OutreachMessage(
-        lead_id=lead.id,
-        tenant_id=tenant.id,
-        channel="email",
-        to_address=to_address,
-        from_address=from_address,
-        subject=subject,
-        body=body,
-        status=status,
-        provider_message_id=provider_message_id,
-        sent_at=datetime.utcnow() if ok else None,
+    db.execute(
+        insert(OutreachMessage),
+        {
+            "lead_id": job.lead_id,
+            "tenant_id": tenant.id,
+            "channel": "email",
+            "to_address": job.to_address,
+            "from_address": from_address,
+            "subject": subject,
+            "body": body,
+            "status": status,
+            "provider_message_id": provider_message_id,
+            "created_at": now,
+            "sent_at": now if ok else None,
+        },
     )
-    db.add(msg)
-    db.commit()
 
-    # 9) Events: email_sent or email_failed
+    # 4) Events: email_sent or email_failed; one commit for steps 3-4
     if ok:
-        _record_event(db, lead.id, tenant.id, "email_sent", {"provider_message_id": provider_message_id})
+        _record_event(db, job.lead_id, tenant.id, "email_sent", {"provider_message_id": provider_message_id})
     else:
-        _record_event(db, lead.id, tenant.id, "email_failed", {"error": err_msg})
+        _record_event(db, job.lead_id, tenant.id, "email_failed", {"error": err_msg})
+    _flush_events(db)
     db.commit()
 
-    return False, None if ok else err_msg
+    return ok, None if ok else err_msg
@@ -0,0 +1,43 @@
+"""In-process TTL cache of tenant resolution by Angi ALAccountId for Knock Knock."""
+import threading
+from typing import NamedTuple, Optional
+
+from cachetools import TTLCache
+
+
+class CachedTenant(NamedTuple):
+    """Tenant fields needed to process a lead; safe to share across sessions/threads."""
+
+    id: str
+    name: str
+    from_email: str
+
+
+# Key is the ALAccountId (None for leads without one); value is the resolved tenant,
+# including tenant_default for unmapped accounts.
+_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+_lock = threading.RLock()
+
+
+def get(al_account_id: Optional[str]) -> Optional[CachedTenant]:
+    """Return the cached tenant for al_account_id, or None on miss."""
+    with _lock:
+        return _cache.get(al_account_id)
+
+
+def put(al_account_id: Optional[str], tenant: CachedTenant) -> None:
+    """Cache the resolved tenant for al_account_id."""
+    with _lock:
+        _cache[al_account_id] = tenant
+
+
+def invalidate(al_account_id: Optional[str]) -> None:
+    """Drop one ALAccountId; call after writing its AngiMapping."""
+    with _lock:
+        _cache.pop(al_account_id, None)
+
+
+def clear() -> None:
+    """Drop all entries; call after writing a Tenant."""
+    with _lock:
+        _cache.clear()